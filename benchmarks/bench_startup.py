@@ -0,0 +1,126 @@
+"""Startup benchmark for the Tickets cog.
+
+Loads the cog into an offline bot whose REST layer is faked, then reports import, cog-load, sync and
+warm-up time and the time until the first interaction (/ticket) has been answered. Run it from the
+deployment checkout so config.py and utils/db.py are importable; the command hash and inactivity
+state go to a temporary directory, so the deployment's files are left alone:
+
+    python benchmarks/bench_startup.py --runs 5
+
+The first run syncs the command tree, later runs take the unchanged-tree path like a restart does.
+A run fails if any phase logs an error.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import discord
+from discord.ext import commands
+from discord.webhook.async_ import AsyncWebhookAdapter
+
+from ticket_replay import FakeHTTP
+
+INTERACTION_ID = 1000
+TICKET_COMMAND = {
+    "id": str(INTERACTION_ID),
+    "application_id": "1",
+    "type": 2,
+    "token": "benchmark",
+    "version": 1,
+    "channel_id": "10",
+    "locale": "en-US",
+    "app_permissions": "0",
+    "entitlements": [],
+    "authorizing_integration_owners": {"0": "1"},
+    "context": 1,
+    "attachment_size_limit": 10 * 1024 * 1024,
+    "user": {"id": "5", "username": "benchmark", "discriminator": "0", "global_name": None, "avatar": None},
+    "data": {"id": "2000", "name": "ticket", "type": 1}
+}
+
+class ErrorLog(logging.Handler):
+    def __init__(self):
+        super().__init__(logging.ERROR)
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+def _feed_canned_responses(http: FakeHTTP, module, bot):
+    # Answer the sync with the commands it uploaded, as Discord does
+    commands_payload = [
+        dict(command, id=str(2000 + index), application_id="1", version="1")
+        for index, command in enumerate(module.command_tree_payload(bot.tree))
+    ]
+    http.feed({"m": "PUT", "p": "/applications/{application_id}/commands", "d": commands_payload})
+    http.feed({
+        "m": "POST",
+        "p": "/interactions/{webhook_id}/{webhook_token}/callback",
+        "d": {"interaction": {"id": str(INTERACTION_ID), "type": TICKET_COMMAND["type"]}}
+    })
+
+async def run_once(directory: str) -> dict:
+    sys.modules.pop("ticket", None)  # measure a cold import every run
+
+    http = FakeHTTP()
+    bot = commands.Bot(command_prefix="!", intents=discord.Intents.default())
+    original_adapter_request = AsyncWebhookAdapter.request
+
+    async def adapter_request(adapter, route, *args, **kwargs):
+        return await http.request(route)
+
+    async def wait_for_response():
+        while INTERACTION_ID not in http.responded:
+            await asyncio.sleep(0)
+
+    async with bot:
+        bot.http.request = http.request
+        bot._connection.application_id = 1
+        AsyncWebhookAdapter.request = adapter_request
+        try:
+            started = time.perf_counter()
+            await bot.load_extension("ticket")
+            module = bot.extensions["ticket"]
+            module.COMMAND_HASH_PATH = os.path.join(directory, "command_tree.hash")
+            module.INACTIVITY_STATE_PATH = os.path.join(directory, "inactivity.json")
+            _feed_canned_responses(http, module, bot)
+            await bot.cogs["Tickets"].on_ready()
+
+            bot._connection.parsers["INTERACTION_CREATE"](TICKET_COMMAND)
+            await asyncio.wait_for(wait_for_response(), timeout=10)
+            handled = http.responded[INTERACTION_ID] - started
+            await asyncio.sleep(0)  # let the command finish before unloading
+            await bot.unload_extension("ticket")
+        finally:
+            AsyncWebhookAdapter.request = original_adapter_request
+
+    result = dict(module.startup_profile.phases)
+    result["first_handled_interaction"] = handled  # from the start of cog loading
+    return result
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark Tickets cog startup")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    errors = ErrorLog()
+    logging.getLogger().addHandler(errors)
+    runs = []
+    with tempfile.TemporaryDirectory() as directory:
+        for _ in range(args.runs):
+            runs.append(asyncio.run(run_once(directory)))
+            if errors.messages:
+                sys.exit(f"Benchmark run failed: {errors.messages[0]}")
+    for phase in runs[0]:
+        values = [run[phase] * 1000 for run in runs if phase in run]
+        print(f"{phase:<28} median {statistics.median(values):8.2f}ms  max {max(values):8.2f}ms")
+
+if __name__ == "__main__":
+    main()
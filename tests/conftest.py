@@ -0,0 +1,39 @@
+import os
+import sys
+import types
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# config.py and utils/db.py are created per deployment (see readme.txt), so tests provide their own
+class FakeDB:
+    def __init__(self):
+        self.tickets = {}
+        self.calls = []
+
+    def __getattr__(self, name):
+        def record(*args, **kwargs):
+            self.calls.append((name, args))
+            return []
+        return record
+
+    def count(self, name):
+        return sum(1 for call, _ in self.calls if call == name)
+
+config = types.ModuleType("config")
+config.TICKET_CATEGORY_ID = 1
+utils = types.ModuleType("utils")
+utils_db = types.ModuleType("utils.db")
+utils_db.db = FakeDB()
+utils.db = utils_db
+sys.modules.setdefault("config", config)
+sys.modules.setdefault("utils", utils)
+sys.modules.setdefault("utils.db", utils_db)
+
+@pytest.fixture
+def db():
+    fake = sys.modules["utils.db"].db
+    fake.tickets.clear()
+    fake.calls.clear()
+    return fake
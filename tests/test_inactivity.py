@@ -0,0 +1,81 @@
+import asyncio
+import types
+
+import pytest
+
+discord = pytest.importorskip("discord")
+
+import ticket
+
+DAY = 24 * 3600
+
+@pytest.fixture
+def tracker():
+    tracker = ticket.InactivityTracker()
+    tracker.wheel = ticket.TimerWheel(ticket.INACTIVITY_TICK, 0)
+    return tracker
+
+def _stages(tracker, now):
+    return [stage for _, stage in tracker.due(now)]
+
+def test_overdue_ticket_keeps_grace_between_stages(tracker):
+    now = 10 * DAY
+    tracker.track(1, 7, 5, "support", last_activity=now - 5 * DAY)
+    assert _stages(tracker, now + 10) == ["warn"]
+    assert _stages(tracker, now + 3600) == []
+    # lock comes (lock - warn) after the warning, close (close - lock) after the lock
+    assert _stages(tracker, now + 12 * 3600 + 20) == ["lock"]
+    assert _stages(tracker, now + 12 * 3600 + 3600) == []
+    assert _stages(tracker, now + 24 * 3600 + 40) == ["close"]
+
+def test_only_creator_messages_reset_the_timer(tracker):
+    tracker.track(1, 7, 5, "support", last_activity=0)
+    tracker.touch(1, author_id=99, now=DAY - 10)
+    assert _stages(tracker, DAY + 10) == ["warn"]
+    tracker.touch(1, author_id=5, now=DAY + 20)
+    assert _stages(tracker, 2 * DAY) == []
+    assert _stages(tracker, 2 * DAY + 30) == ["warn"]
+
+def test_failed_close_is_retried(tracker):
+    tracker.track(1, 7, 5, "support", last_activity=0)
+    entries = []
+    for now in range(0, 4 * DAY, ticket.INACTIVITY_TICK * 60):
+        entries += tracker.due(now)
+    entry, stage = entries[-1]
+    assert stage == "close" and 1 in tracker
+    tracker.retry(entry, delay=60, now=4 * DAY)
+    assert _stages(tracker, 5 * DAY) == ["close"]
+
+def test_tracker_state_round_trips(tracker, tmp_path):
+    tracker.track(1, 7, 5, "support", last_activity=0)
+    tracker.due(DAY + 10)
+    path = str(tmp_path / "inactivity.json")
+    tracker.save(path, tracker.snapshot())
+    last_activity, stage, deadline = ticket.InactivityTracker.load(path)["1"]
+    assert (last_activity, stage) == (0, 1)
+    assert deadline >= DAY + 10 + 12 * 3600
+
+def test_lock_keeps_channel_private_and_mutes_creator():
+    everyone, creator, me = "everyone", "creator", "me"
+    overwrites = {
+        everyone: discord.PermissionOverwrite(read_messages=False),
+        creator: discord.PermissionOverwrite(read_messages=True, send_messages=True),
+        me: discord.PermissionOverwrite(read_messages=True, send_messages=True, manage_channels=True)
+    }
+
+    class Channel:
+        guild = types.SimpleNamespace(me=me)
+
+        @property
+        def overwrites(self):
+            return {target: discord.PermissionOverwrite(**dict(overwrite)) for target, overwrite in overwrites.items()}
+
+        async def edit(self, overwrites):
+            self.edited = overwrites
+
+    channel = Channel()
+    asyncio.run(ticket._lock_channel(channel))
+    assert channel.edited[everyone].read_messages is False
+    assert channel.edited[creator].read_messages is True
+    assert channel.edited[creator].send_messages is False
+    assert channel.edited[me].send_messages is True
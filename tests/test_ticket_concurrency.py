@@ -0,0 +1,172 @@
+import asyncio
+import itertools
+
+import pytest
+
+pytest.importorskip("discord")
+
+import ticket
+
+_interaction_ids = itertools.count(1)
+
+class FakeResponse:
+    def __init__(self, log):
+        self.log = log
+
+    async def send_message(self, content=None, **kwargs):
+        self.log.append(("send_message", content, kwargs.get("ephemeral", False)))
+
+    async def send_modal(self, modal):
+        self.log.append(("send_modal", type(modal).__name__, False))
+
+    async def defer(self, **kwargs):
+        self.log.append(("defer", None, kwargs.get("ephemeral", False)))
+
+class FakeChannel:
+    def __init__(self, log, creator_id):
+        self.log = log
+        self.id = 900
+        self.name = "ticket-0007"
+        self.topic = f"Ticket for creator ({creator_id})"
+        self.overwrites = {}
+
+    async def edit(self, **kwargs):
+        self.log.append(("channel.edit", None, False))
+        await asyncio.sleep(0)  # yield like a REST call so concurrent clicks interleave
+
+    async def history(self, **kwargs):
+        return
+        yield
+
+    async def send(self, *args, **kwargs):
+        self.log.append(("channel.send", None, False))
+
+class FakeMessage:
+    def __init__(self, log):
+        self.log = log
+
+    async def edit(self, **kwargs):
+        self.log.append(("message.edit", None, False))
+
+class FakeLogsChannel:
+    name = "ticket-logs"
+
+    def __init__(self, log):
+        self.log = log
+
+    async def send(self, *args, **kwargs):
+        self.log.append(("logs.send", None, False))
+        await asyncio.sleep(0)
+
+class FakeGuild:
+    def __init__(self, channel):
+        self.roles = []
+        self.text_channels = [channel, FakeLogsChannel(channel.log)]
+        self.me = object()
+        self.default_role = object()
+
+    def get_member(self, member_id):
+        return None
+
+class FakePermissions:
+    administrator = True
+
+class FakeUser:
+    def __init__(self, user_id):
+        self.id = user_id
+        self.name = f"user{user_id}"
+        self.mention = f"<@{user_id}>"
+        self.roles = []
+        self.guild_permissions = FakePermissions()
+
+class FakeInteraction:
+    def __init__(self, user_id, channel, log):
+        self.id = next(_interaction_ids)
+        self.user = FakeUser(user_id)
+        self.channel = channel
+        self.guild = channel.guild
+        self.message = FakeMessage(log)
+        self.response = FakeResponse(log)
+
+@pytest.fixture
+def log():
+    ticket.ticket_states = ticket.TicketStateRegistry()
+    return []
+
+@pytest.fixture
+def channel(log):
+    channel = FakeChannel(log, creator_id=5)
+    channel.guild = FakeGuild(channel)
+    return channel
+
+def _ephemeral_rejections(log):
+    return [entry for entry in log if entry[0] == "send_message" and entry[2]]
+
+def test_concurrent_claims_assign_once(db, log, channel):
+    async def run():
+        view = ticket.TicketManageView(7)
+        button = next(item for item in view.children if isinstance(item, ticket.ClaimTicketButton))
+        await asyncio.gather(
+            button.callback(FakeInteraction(1, channel, log)),
+            button.callback(FakeInteraction(2, channel, log))
+        )
+        return view
+
+    view = asyncio.run(run())
+    assert db.count("assign_ticket") == 1
+    assert [entry[0] for entry in log].count("channel.edit") == 1
+    assert [entry[1] for entry in _ephemeral_rejections(log)] == ["This ticket is being claimed by someone else."]
+    assert view.claimed_by in (1, 2)
+
+def test_claim_then_unclaim_is_not_a_duplicate(db, log, channel):
+    async def run():
+        view = ticket.TicketManageView(7)
+        button = next(item for item in view.children if isinstance(item, ticket.ClaimTicketButton))
+        await button.callback(FakeInteraction(1, channel, log))
+        await button.callback(FakeInteraction(1, channel, log))
+
+    asyncio.run(run())
+    assert db.count("assign_ticket") == 2
+    assert not _ephemeral_rejections(log)
+
+def test_duplicate_transaction_submit_records_once(db, log, channel):
+    async def run():
+        modals = [ticket.CompleteTransactionModal() for _ in range(2)]
+        for modal in modals:
+            for item in modal.children:
+                item._value = "value"
+        await asyncio.gather(*(modal.on_submit(FakeInteraction(5, channel, log)) for modal in modals))
+        await modals[0].on_submit(FakeInteraction(5, channel, log))
+
+    asyncio.run(run())
+    assert db.count("store_transaction_info") == 1
+    assert [entry[0] for entry in log].count("logs.send") == 1
+    replies = [entry[1] for entry in _ephemeral_rejections(log)]
+    assert replies.count("Your previous click is still being processed.") == 1
+    assert replies.count("Transaction details were already recorded for this ticket.") == 1
+
+def test_double_close_locks_channel_once(db, log, channel):
+    async def run():
+        view = ticket.TicketManageView(7)
+        button = next(item for item in view.children if isinstance(item, ticket.CloseTicketButton))
+        await asyncio.gather(
+            button.callback(FakeInteraction(5, channel, log)),
+            button.callback(FakeInteraction(5, channel, log))
+        )
+
+    asyncio.run(run())
+    assert [entry[0] for entry in log].count("channel.edit") == 1
+    assert [entry[0] for entry in log].count("send_modal") == 1
+    assert len(_ephemeral_rejections(log)) == 1
+
+def test_replayed_interaction_is_rejected(db, log, channel):
+    async def run():
+        view = ticket.TicketManageView(7)
+        button = next(item for item in view.children if isinstance(item, ticket.ClaimTicketButton))
+        interaction = FakeInteraction(1, channel, log)
+        await button.callback(interaction)
+        await button.callback(interaction)
+
+    asyncio.run(run())
+    assert db.count("assign_ticket") == 1
+    assert _ephemeral_rejections(log)[0][1] == "This action has already been handled."
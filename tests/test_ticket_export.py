@@ -0,0 +1,57 @@
+import csv
+import gzip
+import io
+import json
+import os
+import random
+import string
+
+import ticket_export
+
+def _read(path):
+    with gzip.open(path, "rt", encoding="utf-8", newline="") as f:
+        return f.read()
+
+def test_csv_columns_do_not_depend_on_first_row(tmp_path):
+    tickets = {
+        1: {"type": "rank", "assigned_to": 3},
+        2: {"type": "rank", "assigned_to": 3, "transaction_info": "UTR 123", "feedback": "great"}
+    }
+    [path] = ticket_export.export_tickets(tickets, str(tmp_path), file_format="csv")
+    rows = list(csv.DictReader(io.StringIO(_read(path))))
+    assert tuple(rows[0].keys()) == ticket_export.EXPORT_COLUMNS
+    assert rows[1]["transaction_info"] == "UTR 123"
+    assert rows[1]["feedback"] == "great"
+
+def test_date_filter_handles_aware_and_naive_dates(tmp_path):
+    tickets = {
+        1: {"created_at": "2026-03-01T10:00:00+05:30"},
+        2: {"created_at": "2026-01-15T00:00:00"},
+        3: {"created_at": 1772323200.0},  # 2026-03-01 00:00 UTC
+        4: {"created_at": "not a date"}
+    }
+    paths = ticket_export.export_tickets(
+        tickets, str(tmp_path),
+        since=ticket_export.parse_date("2026-02-01"),
+        until=ticket_export.parse_date("2026-04-01")
+    )
+    rows = [json.loads(line) for path in paths for line in _read(path).splitlines()]
+    assert sorted(row["ticket_id"] for row in rows) == [1, 3]
+
+def test_parts_split_at_chunk_size(tmp_path):
+    tickets = {i: {"description": f"{i} " * 200} for i in range(2000)}
+    paths = list(ticket_export.export_tickets(tickets, str(tmp_path), chunk_size=4096))
+    assert len(paths) > 1
+    total = sum(len(_read(path).splitlines()) for path in paths)
+    assert total == 2000
+
+def test_parts_stay_under_chunk_size_with_large_transcripts(tmp_path, monkeypatch):
+    rng = random.Random(0)
+    transcripts = {i: "".join(rng.choice(string.printable) for _ in range(3000)) for i in range(40)}
+    monkeypatch.setattr(ticket_export, "load_transcript", transcripts.get)
+    tickets = {i: {"type": "rank"} for i in range(40)}
+    paths = list(ticket_export.export_tickets(tickets, str(tmp_path), include_transcripts=True, chunk_size=8192))
+    assert len(paths) > 1
+    assert all(os.path.getsize(path) <= 8192 for path in paths)
+    rows = [json.loads(line) for path in paths for line in _read(path).splitlines()]
+    assert [row["transcript"] for row in rows] == [transcripts[i] for i in range(40)]
@@ -0,0 +1,72 @@
+import asyncio
+import time
+
+import pytest
+
+discord = pytest.importorskip("discord")
+
+import ticket_replay
+
+class FakeRoute:
+    method = "POST"
+    path = "/channels/{channel_id}/messages"
+    url = "https://discord.com/api/v10/channels/1/messages"
+
+def test_modal_values_and_tokens_are_redacted():
+    data = {
+        "id": "55", "type": 5, "token": "secret-token",
+        "data": {"custom_id": "m", "components": [{"type": 1, "components": [{"type": 4, "custom_id": "utr", "value": "UTR 9981"}]}]}
+    }
+    redacted = ticket_replay._redact_event("INTERACTION_CREATE", data)
+    assert redacted["token"] == "redacted"
+    assert redacted["data"]["components"][0]["components"][0]["value"] == "xxx 1111"
+    assert data["token"] == "secret-token"  # the live payload is left untouched
+
+def test_recorded_errors_replay_as_discord_exceptions():
+    http = ticket_replay.FakeHTTP()
+    http.feed({"m": "POST", "p": FakeRoute.path, "e": 404, "c": 10003, "x": "Unknown Channel"})
+    http.feed({"m": "POST", "p": FakeRoute.path, "e": 403, "c": 50013, "x": "Missing Permissions"})
+
+    async def run():
+        with pytest.raises(discord.NotFound):
+            await http.request(FakeRoute())
+        with pytest.raises(discord.Forbidden):
+            await http.request(FakeRoute())
+        assert await http.request(FakeRoute()) is None
+
+    asyncio.run(run())
+    assert http.unmatched[f"POST {FakeRoute.path}"] == 1
+
+def test_log_round_trip(tmp_path):
+    path = str(tmp_path / "traffic.log")
+    recorder = ticket_replay.Recorder(path)
+    recorder.write(ticket_replay.KIND_GATEWAY, {"t": "MESSAGE_CREATE", "d": {"id": "1"}})
+    recorder.write(ticket_replay.KIND_REST, {"m": "GET", "p": "/x", "d": None})
+    recorder.close()
+    records = [(kind, payload) for _, kind, payload in ticket_replay.read_log(path)]
+    assert records == [
+        (ticket_replay.KIND_GATEWAY, {"t": "MESSAGE_CREATE", "d": {"id": "1"}}),
+        (ticket_replay.KIND_REST, {"m": "GET", "p": "/x", "d": None})
+    ]
+
+def test_recorder_stops_when_the_writer_fails(tmp_path):
+    class FullDisk:
+        def write(self, data):
+            raise OSError(28, "No space left on device")
+
+        def close(self):
+            pass
+
+    recorder = ticket_replay.Recorder(str(tmp_path / "traffic.log"))
+    recorder._file.close()
+    recorder._file = FullDisk()
+    recorder.write(ticket_replay.KIND_REST, {"m": "GET", "p": "/x", "d": None})
+    for _ in range(500):
+        if recorder._stopped:
+            break
+        time.sleep(0.01)
+    assert recorder._stopped
+    recorder.write(ticket_replay.KIND_REST, {"m": "GET", "p": "/x", "d": None})
+    assert recorder._queue.empty()
+    recorder.close()
+    assert not recorder._thread.is_alive()
@@ -1,12 +1,20 @@
+import time
+_IMPORT_STARTED = time.perf_counter()
+
 import discord
 from discord import app_commands, ui
 from discord.ext import commands
 from config import TICKET_CATEGORY_ID
 from utils.db import db
+from ticket_export import EXPORT_CHUNK_SIZE, EXPORT_FORMATS, export_tickets, parse_date, save_transcript
 import logging
 from datetime import datetime
 import asyncio
 import io
+import os
+import json
+import hashlib
+import tempfile
 
 # Ticket categories with emojis
 TICKET_CATEGORIES = {
@@ -23,6 +31,32 @@ UPI_ID = "your_upi_id_here"
 QR_CODE_PATH = "path_to_your_qr_code_image.png"
 PAYMENT_METHODS = ["UPI", "PayPal", "Credit Card"]
 
+TICKET_CLOSE_DELAY = 15  # seconds between closing a ticket and deleting its channel
+
+# Startup configuration – the command tree is only synced when its hash changes
+COMMAND_HASH_PATH = "command_tree.hash"
+STARTUP_PROFILE = os.getenv("TICKET_STARTUP_PROFILE") == "1"
+# Set to a file path to record gateway events and REST responses for ticket_replay.py
+RECORD_PATH = os.getenv("TICKET_RECORD_PATH")
+
+# Inactivity stages – seconds since the last message before each stage runs, per ticket type
+INACTIVITY_STAGES = ("warn", "lock", "close")
+INACTIVITY_TIMEOUTS = {
+    "default": {"warn": 24 * 3600, "lock": 36 * 3600, "close": 48 * 3600},
+    "rank": {"warn": 12 * 3600, "lock": 18 * 3600, "close": 24 * 3600},
+    "staff": {"warn": 72 * 3600, "lock": 96 * 3600, "close": 120 * 3600},
+    "appeal": {"warn": 48 * 3600, "lock": 72 * 3600, "close": 96 * 3600}
+}
+# Multiplier applied to the timeouts above based on ticket priority
+INACTIVITY_PRIORITY_FACTOR = {"low": 0.5, "medium": 1.0, "high": 2.0, "urgent": 2.0}
+INACTIVITY_TICK = 10  # seconds between sweeps of the inactivity timer wheel
+INACTIVITY_RETRY_DELAY = 300  # seconds before a failed warn/lock/close is retried
+INACTIVITY_SAVE_INTERVAL = 60  # seconds between saves of the tracker state
+INACTIVITY_STATE_PATH = "inactivity.json"  # last creator activity and stage per ticket channel
+
+# Bytes kept free below the guild's upload limit when sizing /ticket_export parts
+EXPORT_UPLOAD_HEADROOM = 512 * 1024
+
 # Permissions checks
 def is_admin():
     async def predicate(interaction: discord.Interaction):
@@ -34,6 +68,346 @@ def is_ticket_creator(ticket_creator_id):
         return interaction.user.id == ticket_creator_id
     return app_commands.check(predicate)
 
+# ───────────── Ticket State & Concurrency ─────────────
+
+# Lifecycle states of a ticket
+TICKET_STATE_OPEN = "open"
+TICKET_STATE_CLAIMED = "claimed"
+TICKET_STATE_CLOSING = "closing"
+TICKET_STATE_CLOSED = "closed"
+
+STATE_IDLE_TTL = 900  # seconds an untouched ticket state stays in memory
+DUPLICATE_WINDOW = 3  # seconds in which a repeated click by the same user is ignored
+
+# Per-ticket lock and state – serializes claim/close/transaction handling for one ticket
+class TicketState:
+    __slots__ = ("ticket_id", "lock", "status", "claimed_by", "transaction_recorded", "recent", "active_action", "last_used")
+
+    def __init__(self, ticket_id: int):
+        self.ticket_id = ticket_id
+        self.lock = asyncio.Lock()
+        self.status = TICKET_STATE_OPEN
+        self.claimed_by = None
+        self.transaction_recorded = False
+        self.recent = {}  # (user_id, action) -> time of last click
+        self.active_action = None  # action of the last accepted click – the one holding the lock
+        self.last_used = time.monotonic()
+
+# Registry of ticket states – created lazily on first interaction and evicted when idle
+class TicketStateRegistry:
+    def __init__(self, idle_ttl: float = STATE_IDLE_TTL, duplicate_window: float = DUPLICATE_WINDOW):
+        self.idle_ttl = idle_ttl
+        self.duplicate_window = duplicate_window
+        self._states = {}
+        self._seen_interactions = {}
+        self._last_sweep = time.monotonic()
+
+    def __len__(self):
+        return len(self._states)
+
+    def get(self, ticket_id: int) -> TicketState:
+        now = time.monotonic()
+        if now - self._last_sweep >= self.idle_ttl:
+            self.evict_idle(now)
+        state = self._states.get(ticket_id)
+        if state is None:
+            state = TicketState(ticket_id)
+            # Re-seed the claim from storage so eviction never loses it
+            assigned_to = db.tickets.get(ticket_id, {}).get("assigned_to")
+            if assigned_to:
+                state.claimed_by = assigned_to
+                state.status = TICKET_STATE_CLAIMED
+            self._states[ticket_id] = state
+        state.last_used = now
+        return state
+
+    def evict_idle(self, now: float = None):
+        now = time.monotonic() if now is None else now
+        self._last_sweep = now
+        for ticket_id, state in list(self._states.items()):
+            if not state.lock.locked() and now - state.last_used >= self.idle_ttl:
+                del self._states[ticket_id]
+        for interaction_id, seen_at in list(self._seen_interactions.items()):
+            if now - seen_at >= self.idle_ttl:
+                del self._seen_interactions[interaction_id]
+
+    def discard(self, ticket_id: int):
+        self._states.pop(ticket_id, None)
+
+    def check(self, interaction: discord.Interaction, state: TicketState, action: str):
+        """Return a rejection message for duplicate or losing clicks, or None if the click may proceed."""
+        now = time.monotonic()
+        if interaction.id in self._seen_interactions:
+            return "This action has already been handled."
+        self._seen_interactions[interaction.id] = now
+
+        key = (interaction.user.id, action)
+        if state.lock.locked():
+            last_click = state.recent.get(key)
+            if last_click is not None and now - last_click < self.duplicate_window:
+                return "Your previous click is still being processed."
+            if action == "claim":
+                # Claim toggles, so a retry after losing the race would unclaim the winner
+                if state.active_action == "claim":
+                    return "This ticket is being claimed by someone else."
+                return "Someone else is handling this ticket right now."
+            return "Another action on this ticket is in progress. Please try again."
+        if state.status == TICKET_STATE_CLOSED:
+            return "This ticket has already been closed."
+        # Only accepted clicks are remembered, so a retry after losing the race is not mistaken for a duplicate
+        state.recent[key] = now
+        state.active_action = action
+        return None
+
+ticket_states = TicketStateRegistry()
+
+# ───────────── Startup & Caches ─────────────
+
+# Startup timings – reported when TICKET_STARTUP_PROFILE=1, read by benchmarks/bench_startup.py
+class StartupProfile:
+    def __init__(self, started: float):
+        self.started = started
+        self.phases = {}
+        self.first_interaction = None
+
+    def record(self, phase: str, started: float):
+        self.phases[phase] = time.perf_counter() - started
+
+    def record_first_interaction(self):
+        if self.first_interaction is None:
+            self.first_interaction = time.perf_counter() - self.started
+            self.report()
+
+    def report(self):
+        if not STARTUP_PROFILE:
+            return
+        timings = ", ".join(f"{phase}={seconds * 1000:.1f}ms" for phase, seconds in self.phases.items())
+        if self.first_interaction is not None:
+            timings += f", first_interaction={self.first_interaction * 1000:.1f}ms"
+        logging.info(f"Tickets startup profile: {timings}")
+
+startup_profile = StartupProfile(_IMPORT_STARTED)
+
+# Rank and payment method catalogs – loaded from the db on first use instead of per select
+class CatalogCache:
+    def __init__(self):
+        self._ranks = None
+        self._payment_methods = None
+
+    def ranks(self):
+        if self._ranks is None:
+            self._ranks = list(db.get_ranks())
+        return self._ranks
+
+    def payment_methods(self):
+        if self._payment_methods is None:
+            self._payment_methods = list(db.get_payment_methods())
+        return self._payment_methods
+
+    def warm(self):
+        self.ranks()
+        self.payment_methods()
+
+    def invalidate(self):
+        self._ranks = None
+        self._payment_methods = None
+
+catalog = CatalogCache()
+
+# ───────────── Inactivity Tracking ─────────────
+
+# Hierarchical timer wheel – O(1) scheduling, expiry cost proportional to due timers
+class TimerWheel:
+    def __init__(self, resolution: float, now: float, slots: int = 64, levels: int = 4):
+        self.resolution = resolution
+        self.slots = slots
+        self.levels = levels
+        self._wheels = [[[] for _ in range(slots)] for _ in range(levels)]
+        self._current_tick = int(now // resolution)
+
+    def schedule(self, deadline: float, item):
+        tick = max(-int(-deadline // self.resolution), self._current_tick + 1)
+        self._insert(tick, item)
+
+    def _insert(self, tick: int, item):
+        delta = tick - self._current_tick
+        for level in range(self.levels):
+            if delta < self.slots ** (level + 1) or level == self.levels - 1:
+                slot = (tick // self.slots ** level) % self.slots
+                self._wheels[level][slot].append((tick, item))
+                return
+
+    def _drain(self, level: int, slot: int, expired: list):
+        bucket = self._wheels[level][slot]
+        self._wheels[level][slot] = []
+        for tick, item in bucket:
+            if tick <= self._current_tick:
+                expired.append(item)
+            else:
+                self._insert(tick, item)
+
+    def advance(self, now: float) -> list:
+        """Move the wheel forward to `now` and return every item whose deadline has passed."""
+        expired = []
+        target = int(now // self.resolution)
+        while self._current_tick < target:
+            self._current_tick += 1
+            tick = self._current_tick
+            # Cascade timers from coarser levels whenever a finer level wraps around
+            for level in range(1, self.levels):
+                span = self.slots ** level
+                if tick % span:
+                    break
+                self._drain(level, (tick // span) % self.slots, expired)
+            self._drain(0, tick % self.slots, expired)
+        return expired
+
+# Last activity of one open ticket channel
+class TicketActivity:
+    __slots__ = ("channel_id", "ticket_id", "creator_id", "ticket_type", "priority", "last_activity", "stage", "deadline")
+
+    def __init__(self, channel_id: int, ticket_id: int, creator_id: int, ticket_type: str, priority: str, last_activity: float):
+        self.channel_id = channel_id
+        self.ticket_id = ticket_id
+        self.creator_id = creator_id
+        self.ticket_type = ticket_type
+        self.priority = priority
+        self.last_activity = last_activity
+        self.stage = 0  # index into INACTIVITY_STAGES of the next stage to run
+        self.deadline = None  # deadline of the timer currently scheduled for this ticket
+
+    def _timeout(self, stage: int) -> float:
+        timeouts = INACTIVITY_TIMEOUTS.get(self.ticket_type, INACTIVITY_TIMEOUTS["default"])
+        return timeouts[INACTIVITY_STAGES[stage]] * INACTIVITY_PRIORITY_FACTOR.get(self.priority, 1.0)
+
+    def stage_due(self) -> float:
+        return self.last_activity + self._timeout(self.stage)
+
+    def stage_gap(self) -> float:
+        """Grace period between the previous stage and the next one."""
+        return self._timeout(self.stage) - self._timeout(self.stage - 1)
+
+# Inactivity tracker – creator messages only update a timestamp, the wheel drives warn/lock/close
+class InactivityTracker:
+    def __init__(self, resolution: float = INACTIVITY_TICK):
+        self._tickets = {}
+        self.wheel = TimerWheel(resolution, time.time())
+
+    def __len__(self):
+        return len(self._tickets)
+
+    def __contains__(self, channel_id: int):
+        return channel_id in self._tickets
+
+    def _schedule(self, entry: TicketActivity, not_before: float = None):
+        entry.deadline = entry.stage_due() if not_before is None else max(entry.stage_due(), not_before)
+        self.wheel.schedule(entry.deadline, (entry.channel_id, entry.deadline))
+
+    def track(self, channel_id: int, ticket_id: int, creator_id: int, ticket_type: str, priority: str = "medium",
+              last_activity: float = None, stage: int = 0, not_before: float = None):
+        entry = TicketActivity(channel_id, ticket_id, creator_id, ticket_type, priority, time.time() if last_activity is None else last_activity)
+        entry.stage = stage
+        self._tickets[channel_id] = entry
+        if stage < len(INACTIVITY_STAGES):
+            self._schedule(entry, not_before)
+
+    def untrack(self, channel_id: int):
+        self._tickets.pop(channel_id, None)
+
+    def touch(self, channel_id: int, author_id: int, now: float = None):
+        entry = self._tickets.get(channel_id)
+        if entry is None or author_id != entry.creator_id:
+            return  # only the creator's replies keep a ticket alive
+        entry.last_activity = time.time() if now is None else now
+        # The pending warn timer is re-checked when it fires; only a later stage needs a new timer
+        if entry.stage:
+            entry.stage = 0
+            self._schedule(entry)
+
+    def set_priority(self, channel_id: int, priority: str):
+        entry = self._tickets.get(channel_id)
+        if entry is None or entry.priority == priority:
+            return
+        entry.priority = priority
+        if entry.stage < len(INACTIVITY_STAGES):
+            # A shorter timeout must not cut the grace period of a stage that is already pending
+            self._schedule(entry, entry.deadline if entry.stage else None)
+
+    def retry(self, entry: TicketActivity, delay: float = INACTIVITY_RETRY_DELAY, now: float = None):
+        """Reschedule a stage that failed to run."""
+        entry.stage -= 1
+        self._tickets[entry.channel_id] = entry
+        self._schedule(entry, (time.time() if now is None else now) + delay)
+
+    def due(self, now: float = None) -> list:
+        """Return (entry, stage) pairs whose inactivity stage is due, scheduling the following stage."""
+        now = time.time() if now is None else now
+        ready = []
+        for channel_id, deadline in self.wheel.advance(now):
+            entry = self._tickets.get(channel_id)
+            if entry is None or entry.deadline != deadline:
+                continue  # untracked or superseded by a newer timer
+            if entry.stage_due() > now:
+                self._schedule(entry)  # activity since this timer was set
+                continue
+            ready.append((entry, INACTIVITY_STAGES[entry.stage]))
+            entry.stage += 1
+            # Entries stay tracked after the last stage until their channel is deleted, so a failed close can be retried
+            if entry.stage < len(INACTIVITY_STAGES):
+                self._schedule(entry, now + entry.stage_gap())
+        return ready
+
+    def snapshot(self) -> dict:
+        return {
+            str(entry.channel_id): [entry.last_activity, entry.stage, entry.deadline]
+            for entry in self._tickets.values()
+        }
+
+    def save(self, path: str, snapshot: dict):
+        with open(path + ".tmp", "w") as f:
+            json.dump(snapshot, f)
+        os.replace(path + ".tmp", path)
+
+    @staticmethod
+    def load(path: str) -> dict:
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+inactivity = InactivityTracker()
+
+def command_tree_payload(tree) -> list:
+    """The payload tree.sync() sends for the global commands."""
+    # discord.py 2.4 added the tree argument to to_dict()
+    if discord.version_info >= (2, 4):
+        return [command.to_dict(tree) for command in tree.get_commands()]
+    return [command.to_dict() for command in tree.get_commands()]
+
+def command_tree_hash(tree) -> str:
+    # Hash exactly the payload tree.sync() would send, so choices, subcommands and permissions count too
+    payload = command_tree_payload(tree)
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+async def sync_commands_if_changed(bot) -> bool:
+    digest = command_tree_hash(bot.tree)
+    try:
+        with open(COMMAND_HASH_PATH) as f:
+            previous = f.read().strip()
+    except OSError:
+        previous = None
+
+    if digest == previous:
+        logging.info("Command tree unchanged, skipping sync")
+        return False
+
+    await bot.tree.sync()
+    with open(COMMAND_HASH_PATH, "w") as f:
+        f.write(digest)
+    logging.info("Command tree synced")
+    return True
+
 # ───────────── UI Components ─────────────
 
 # Priority selection dropdown – available only to admins/staff; one-time use
@@ -56,6 +430,7 @@ class PrioritySelect(discord.ui.Select):
         if interaction.channel.topic:
             ticket_id = int(interaction.channel.name.split('-')[1])
             db.update_ticket_priority(ticket_id, self.values[0])
+            inactivity.set_priority(interaction.channel.id, self.values[0])
         else:
             await interaction.response.send_message("Channel topic is None. Cannot update priority.", ephemeral=True)
         
@@ -140,7 +515,7 @@ class ConfirmCallStaffButton(discord.ui.Button):
 # Payment Method dropdown – shown in rank-purchase tickets after rank selection
 class PaymentMethodSelect(discord.ui.Select):
     def __init__(self):
-        options = [discord.SelectOption(label=method, value=method.lower()) for method in db.get_payment_methods()]
+        options = [discord.SelectOption(label=method, value=method.lower()) for method in catalog.payment_methods()]
         super().__init__(placeholder="Select Payment Method...", options=options, custom_id="payment_method_select")
 
     async def callback(self, interaction: discord.Interaction):
@@ -212,6 +587,17 @@ class CompleteTransactionModal(discord.ui.Modal):
 
     async def on_submit(self, interaction: discord.Interaction):
         ticket_id = int(interaction.channel.name.split('-')[1])
+        state = ticket_states.get(ticket_id)
+        rejection = ticket_states.check(interaction, state, "transaction")
+        if not rejection and state.transaction_recorded:
+            rejection = "Transaction details were already recorded for this ticket."
+        if rejection:
+            return await interaction.response.send_message(rejection, ephemeral=True)
+
+        async with state.lock:
+            await self._record_transaction(interaction, ticket_id, state)
+
+    async def _record_transaction(self, interaction: discord.Interaction, ticket_id: int, state: TicketState):
         transaction_info = (
             f"App Used: {self.app_used.value}\n"
             f"User  ID: {self.user_id.value}\n"
@@ -220,6 +606,7 @@ class CompleteTransactionModal(discord.ui.Modal):
             f"Time: {self.time.value}"
         )
         db.store_transaction_info(ticket_id, transaction_info)
+        state.transaction_recorded = True
 
         # Update the ticket’s initial embed to show transaction info at the top and remove payment buttons
         async for msg in interaction.channel.history(limit=10, oldest_first=True):
@@ -245,11 +632,6 @@ class CompleteTransactionModal(discord.ui.Modal):
 
         await interaction.response.send_message("Transaction details recorded. PLEASE SHARE THE RECEIPT OR SCREENSHOT OF THE PAYMENT IN THE CHAT.", ephemeral=True)
 
-        # Remove the payment buttons
-        view: TicketManageView = self.view
-        view.clear_items()
-        await interaction.message.edit(view=view)
-
 # Feedback modal – shown to ticket creator on closing the ticket
 class FeedbackModal(discord.ui.Modal):
     def __init__(self, ticket_id: int):
@@ -269,23 +651,33 @@ class FeedbackModal(discord.ui.Modal):
         if not self.rating.value.isdigit() or not (1 <= int(self.rating.value) <= 5):
             return await interaction.response.send_message("Rating must be a number between 1 and 5.", ephemeral=True)
 
-        rating_value = self.rating.value
-        db.store_ticket_feedback(self.ticket_id, f"{self.feedback.value}\nRating: {rating_value} stars")
+        state = ticket_states.get(self.ticket_id)
+        rejection = ticket_states.check(interaction, state, "feedback")
+        if rejection:
+            return await interaction.response.send_message(rejection, ephemeral=True)
 
-        feedback_channel = discord.utils.get(interaction.guild.text_channels, name="feedback")
-        if not feedback_channel:
-            feedback_channel = await interaction.guild.create_text_channel(name="feedback")
+        async with state.lock:
+            rating_value = self.rating.value
+            db.store_ticket_feedback(self.ticket_id, f"{self.feedback.value}\nRating: {rating_value} stars")
 
-        embed = discord.Embed(
-            title=f"Feedback for Ticket #{self.ticket_id}",
-            description=f"Rating: {rating_value} stars\nFeedback: {self.feedback.value}",
-            color=discord.Color.blue(),
-            timestamp=datetime.utcnow()
-        )
-        await feedback_channel.send(embed=embed)
+            feedback_channel = discord.utils.get(interaction.guild.text_channels, name="feedback")
+            if not feedback_channel:
+                feedback_channel = await interaction.guild.create_text_channel(name="feedback")
+
+            embed = discord.Embed(
+                title=f"Feedback for Ticket #{self.ticket_id}",
+                description=f"Rating: {rating_value} stars\nFeedback: {self.feedback.value}",
+                color=discord.Color.blue(),
+                timestamp=datetime.utcnow()
+            )
+            await feedback_channel.send(embed=embed)
+
+            await interaction.response.send_message(f"Thank you for your feedback. Ticket will be closed in {TICKET_CLOSE_DELAY} seconds.", ephemeral=True)
+            # Archive after responding – reading the history can take longer than the interaction deadline
+            await _archive_ticket(interaction.channel, self.ticket_id, interaction.user.name)
+            state.status = TICKET_STATE_CLOSED
 
-        await interaction.response.send_message("Thank you for your feedback. Ticket will be closed in 15 seconds.", ephemeral=True)
-        await asyncio.sleep(15)
+        await asyncio.sleep(TICKET_CLOSE_DELAY)
         await interaction.channel.delete()
 
 # Ticket category selection dropdown
@@ -325,7 +717,7 @@ class RankSelectView(discord.ui.View):
 
 class RankSelect(discord.ui.Select):
     def __init__(self):
-        options = [discord.SelectOption(label=rank, value=rank.lower()) for rank in db.get_ranks()]
+        options = [discord.SelectOption(label=rank, value=rank.lower()) for rank in catalog.ranks()]
         super().__init__(placeholder="Select your rank...", options=options, custom_id="rank_select")
 
     async def callback(self, interaction: discord.Interaction):
@@ -407,11 +799,20 @@ class ClaimTicketButton(discord.ui.Button):
         if not (interaction.user.guild_permissions.administrator or discord.utils.get(interaction.user.roles, name="Staff")):
             return await interaction.response.send_message("You don't have permission to claim tickets.", ephemeral=True)
 
+        state = ticket_states.get(self.ticket_number)
+        rejection = ticket_states.check(interaction, state, "claim")
+        if rejection:
+            return await interaction.response.send_message(rejection, ephemeral=True)
+
         view: TicketManageView = self.view
-        if view.claimed_by is None:
-            success = await view.update_permissions(interaction.channel, interaction, True)
-            if success:
-                view.claimed_by = interaction.user.id
+        async with state.lock:
+            if state.claimed_by is None:
+                success = await view.update_permissions(interaction.channel, interaction, True)
+                if not success:
+                    return await interaction.response.send_message("Failed to claim ticket. Please try again.", ephemeral=True)
+                state.claimed_by = interaction.user.id
+                state.status = TICKET_STATE_CLAIMED
+                view.claimed_by = state.claimed_by
                 self.label = "Unclaim Ticket"
                 self.style = discord.ButtonStyle.danger
                 db.assign_ticket(self.ticket_number, interaction.user.id)
@@ -420,32 +821,31 @@ class ClaimTicketButton(discord.ui.Button):
                     description=f"This ticket has been claimed by {interaction.user.mention}",
                     color=discord.Color.green()
                 )
-                await interaction.response.send_message(embed=embed)
-            else:
-                await interaction.response.send_message("Failed to claim ticket. Please try again.", ephemeral=True)
-        else:
-            if view.claimed_by == interaction.user.id or interaction.user.guild_permissions.administrator:
+            elif state.claimed_by == interaction.user.id or interaction.user.guild_permissions.administrator:
                 success = await view.update_permissions(interaction.channel, interaction, False)
-                if success:
-                    view.claimed_by = None
-                    self.label = "Claim Ticket"
-                    self.style = discord.ButtonStyle.primary
-                    db.assign_ticket(self.ticket_number, 0)
-                    embed = discord.Embed(
-                        title="Ticket Unclaimed",
-                        description=f"This ticket has been unclaimed by {interaction.user.mention}",
-                        color=discord.Color.orange()
-                    )
-                    await interaction.response.send_message(embed=embed)
-                else:
-                    await interaction.response.send_message("Failed to unclaim ticket. Please try again.", ephemeral=True)
+                if not success:
+                    return await interaction.response.send_message("Failed to unclaim ticket. Please try again.", ephemeral=True)
+                state.claimed_by = None
+                state.status = TICKET_STATE_OPEN
+                view.claimed_by = None
+                self.label = "Claim Ticket"
+                self.style = discord.ButtonStyle.primary
+                db.assign_ticket(self.ticket_number, 0)
+                embed = discord.Embed(
+                    title="Ticket Unclaimed",
+                    description=f"This ticket has been unclaimed by {interaction.user.mention}",
+                    color=discord.Color.orange()
+                )
             else:
-                claimer = interaction.guild.get_member(view.claimed_by)
-                await interaction.response.send_message(
-                    f"This ticket is claimed by {claimer.mention}. Only they or an administrator can unclaim it.",
+                claimer = interaction.guild.get_member(state.claimed_by)
+                claimer_name = claimer.mention if claimer else "another staff member"
+                return await interaction.response.send_message(
+                    f"This ticket is claimed by {claimer_name}. Only they or an administrator can unclaim it.",
                     ephemeral=True
                 )
-        await interaction.message.edit(view=view)
+
+            await interaction.response.send_message(embed=embed)
+            await interaction.message.edit(view=view)
 
 # Close Ticket button – only the ticket creator may provide feedback and close the ticket
 class CloseTicketButton(discord.ui.Button):
@@ -462,13 +862,18 @@ class CloseTicketButton(discord.ui.Button):
         if interaction.user.id != creator_id:
             return await interaction.response.send_message("Only the ticket creator can provide feedback and close the ticket.", ephemeral=True)
 
-        # Lock the channel so no one can send messages
-        overwrites = interaction.channel.overwrites
-        for role in interaction.guild.roles:
-            overwrites[role] = discord.PermissionOverwrite(send_messages=False)
-        await interaction.channel.edit(overwrites=overwrites)
+        state = ticket_states.get(ticket_id)
+        rejection = ticket_states.check(interaction, state, "close")
+        if rejection:
+            return await interaction.response.send_message(rejection, ephemeral=True)
+
+        async with state.lock:
+            # Lock the channel so no one can send messages (skipped if a previous close already did)
+            if state.status != TICKET_STATE_CLOSING:
+                await _lock_channel(interaction.channel)
+                state.status = TICKET_STATE_CLOSING
 
-        await interaction.response.send_modal(FeedbackModal(ticket_id))
+            await interaction.response.send_modal(FeedbackModal(ticket_id))
 
 # ───────────── Other Modals for Ticket Creation ─────────────
 
@@ -597,6 +1002,7 @@ async def _create_ticket(interaction: discord.Interaction, ticket_type: str, add
             interaction.guild.me: discord.PermissionOverwrite(read_messages=True, send_messages=True, manage_channels=True)
         }
         channel = await category.create_text_channel(name=channel_name, overwrites=overwrites, topic=f"Ticket for {interaction.user.name} ({interaction.user.id})")
+        inactivity.track(channel.id, ticket_number, interaction.user.id, ticket_type)
 
         db.create_ticket(
             channel.id,
@@ -634,11 +1040,181 @@ async def _create_ticket(interaction: discord.Interaction, ticket_type: str, add
             except Exception as err:
                 logging.error(err)
 
+# ───────────── Ticket Closing Logic ─────────────
+
+async def _lock_channel(channel: discord.TextChannel):
+    """Deny sending to every role and member with an overwrite, keeping their read access as it was."""
+    overwrites = channel.overwrites
+    for target, overwrite in overwrites.items():
+        if target != channel.guild.me:  # the bot still posts warnings and the feedback prompt
+            overwrite.send_messages = False
+    await channel.edit(overwrites=overwrites)
+
+async def _archive_ticket(channel: discord.TextChannel, ticket_id: int, closed_by: str):
+    """Post the transcript to ticket-logs and mark the ticket closed; the caller deletes the channel."""
+    guild = channel.guild
+    creator_id = int(channel.topic.split('(')[-1].split(')')[0])
+    creator = guild.get_member(creator_id)
+    category_name = channel.category.name
+    claimed_by = db.tickets[ticket_id].get("assigned_to", "Unclaimed")
+    messages = []
+    async for message in channel.history(limit=None, oldest_first=True):
+        messages.append(f"{message.created_at} - {message.author}: {message.content}")
+    transcript = "\n".join(messages)
+    logs_channel = discord.utils.get(guild.text_channels, name="ticket-logs")
+    if not logs_channel:
+        logs_channel = await guild.create_text_channel(name="ticket-logs", topic="Ticket transcripts and logs")
+
+    embed = discord.Embed(
+        title=f"Ticket #{ticket_id} Transcript",
+        description="Ticket has been closed and archived",
+        color=discord.Color.red(),
+        timestamp=datetime.utcnow()
+    )
+    embed.add_field(name="Category", value=category_name)
+    embed.add_field(name="Created by", value=creator.name if creator else str(creator_id))
+    embed.add_field(name="Claimed by", value=claimed_by)
+    embed.add_field(name="Closed by", value=closed_by)
+    # Embed fields are capped at 1024 characters; the full transcript is attached as a file
+    embed.add_field(name="Transcript", value=(transcript or "No messages.") if len(transcript) <= 1024 else transcript[:1021] + "...")
+
+    db.close_ticket(ticket_id)
+    save_transcript(ticket_id, transcript)
+    await logs_channel.send(embed=embed, file=discord.File(fp=io.StringIO(transcript), filename=f"ticket-{ticket_id}-transcript.txt"))
+
 # ───────────── Cog Implementation and Admin Commands ─────────────
 
 class Tickets(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        self._warmed_up = False
+        self._sweeper = None
+        self._warmup = None
+        self._first_interaction = None
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        # on_ready fires again on reconnects; sync and warm-up only run once
+        if self._warmed_up:
+            return
+        self._warmed_up = True
+
+        started = time.perf_counter()
+        try:
+            await sync_commands_if_changed(self.bot)
+        except Exception as e:
+            logging.error(f"Error syncing commands: {e}")
+        startup_profile.record("sync", started)
+
+        started = time.perf_counter()
+        catalog.warm()
+        self._track_open_tickets()
+        self._sweeper = asyncio.create_task(self._inactivity_sweeper())
+        startup_profile.record("warm_up", started)
+        startup_profile.report()
+
+    @commands.Cog.listener()
+    async def on_interaction(self, interaction: discord.Interaction):
+        if startup_profile.first_interaction is None and self._first_interaction is None:
+            self._first_interaction = asyncio.create_task(self._wait_first_response(interaction))
+
+    async def _wait_first_response(self, interaction: discord.Interaction):
+        # on_interaction fires before the handler runs; the first interaction counts once it has been answered
+        deadline = time.perf_counter() + 3  # Discord's limit for the initial response
+        while not interaction.response.is_done() and time.perf_counter() < deadline:
+            await asyncio.sleep(0.001)
+        if interaction.response.is_done():
+            startup_profile.record_first_interaction()
+        self._first_interaction = None
+
+    @commands.Cog.listener()
+    async def on_message(self, message: discord.Message):
+        inactivity.touch(message.channel.id, message.author.id)
+
+    @commands.Cog.listener()
+    async def on_guild_channel_delete(self, channel):
+        inactivity.untrack(channel.id)
+        if channel.name.startswith("ticket-"):
+            try:
+                ticket_states.discard(int(channel.name.split('-')[1]))
+            except ValueError:
+                pass
+
+    def _track_open_tickets(self):
+        # Seed the tracker from the saved state; tickets it does not know fall back to their last message id
+        saved = InactivityTracker.load(INACTIVITY_STATE_PATH)
+        ticket_types = {data["name"]: ticket_type for ticket_type, data in TICKET_CATEGORIES.items()}
+        for guild in self.bot.guilds:
+            for channel in guild.text_channels:
+                if not channel.name.startswith("ticket-") or not channel.category or channel.category.name not in ticket_types:
+                    continue
+                try:
+                    ticket_id = int(channel.name.split('-')[1])
+                    creator_id = int(channel.topic.split('(')[-1].split(')')[0])
+                except (ValueError, AttributeError):
+                    continue
+                priority = db.tickets.get(ticket_id, {}).get("priority", "medium")
+                ticket_type = ticket_types[channel.category.name]
+                if str(channel.id) in saved:
+                    last_activity, stage, deadline = saved[str(channel.id)]
+                    stage = min(stage, len(INACTIVITY_STAGES) - 1)  # a close that never finished runs again
+                    inactivity.track(channel.id, ticket_id, creator_id, ticket_type, priority, last_activity, stage, deadline)
+                else:
+                    last_activity = discord.utils.snowflake_time(channel.last_message_id or channel.id).timestamp()
+                    inactivity.track(channel.id, ticket_id, creator_id, ticket_type, priority, last_activity)
+
+    def cog_unload(self):
+        if self._sweeper:
+            self._sweeper.cancel()
+            inactivity.save(INACTIVITY_STATE_PATH, inactivity.snapshot())
+        recorder = getattr(self.bot, "ticket_recorder", None)
+        if recorder:
+            recorder.close(wait=False)  # the writer thread flushes the backlog; exit waits for it
+            del self.bot.ticket_recorder
+
+    async def _inactivity_sweeper(self):
+        last_save = time.monotonic()
+        while True:
+            await asyncio.sleep(INACTIVITY_TICK)
+            for entry, stage in inactivity.due():
+                try:
+                    await self._run_inactivity_stage(entry, stage)
+                except Exception as e:
+                    logging.error(f"Error running inactivity {stage} for ticket #{entry.ticket_id}: {e}")
+                    inactivity.retry(entry)
+            if time.monotonic() - last_save >= INACTIVITY_SAVE_INTERVAL:
+                last_save = time.monotonic()
+                try:
+                    await asyncio.to_thread(inactivity.save, INACTIVITY_STATE_PATH, inactivity.snapshot())
+                except OSError as e:
+                    logging.error(f"Error saving inactivity state: {e}")
+
+    async def _run_inactivity_stage(self, entry: TicketActivity, stage: str):
+        channel = self.bot.get_channel(entry.channel_id)
+        if channel is None:
+            return inactivity.untrack(entry.channel_id)
+
+        state = ticket_states.get(entry.ticket_id)
+        if state.status == TICKET_STATE_CLOSED:
+            return inactivity.untrack(entry.channel_id)
+        if state.status == TICKET_STATE_CLOSING and stage != "close":
+            return  # already locked by the close button, only the auto-close is left
+
+        if stage == "warn":
+            creator_id = int(channel.topic.split('(')[-1].split(')')[0])
+            await channel.send(f"<@{creator_id}> This ticket has been inactive and will be locked and closed automatically if there is no reply.")
+        elif stage == "lock":
+            async with state.lock:
+                if state.status not in (TICKET_STATE_OPEN, TICKET_STATE_CLAIMED):
+                    return  # closed while waiting for the lock
+                await _lock_channel(channel)
+        elif stage == "close":
+            async with state.lock:
+                if state.status == TICKET_STATE_CLOSED:
+                    return  # /closeticket or the feedback modal closed it while we waited
+                await _archive_ticket(channel, entry.ticket_id, "Auto-close (inactivity)")
+                state.status = TICKET_STATE_CLOSED
+            await channel.delete()
 
     @is_admin()
     @app_commands.command(name="ticket_setup", description="Set up the ticket system")
@@ -674,36 +1250,20 @@ class Tickets(commands.Cog):
             await interaction.response.send_message("This command can only be used in a ticket channel.", ephemeral=True)
             return
 
-        await interaction.response.defer()
         ticket_id = int(interaction.channel.name.split('-')[1])
-        creator_id = int(interaction.channel.topic.split('(')[-1].split(')')[0])
-        creator = interaction.guild.get_member(creator_id)
-        category_name = interaction.channel.category.name
-        claimed_by = db.tickets[ticket_id].get("assigned_to", "Unclaimed")
-        messages = []
-        async for message in interaction.channel.history(limit=None, oldest_first=True):
-            messages.append(f"{message.created_at} - {message.author}: {message.content}")
-        transcript = "\n".join(messages)
-        logs_channel = discord.utils.get(interaction.guild.text_channels, name="ticket-logs")
-        if not logs_channel:
-            logs_channel = await interaction.guild.create_text_channel(name="ticket-logs", topic="Ticket transcripts and logs")
+        state = ticket_states.get(ticket_id)
+        rejection = ticket_states.check(interaction, state, "close")
+        if rejection:
+            await interaction.response.send_message(rejection, ephemeral=True)
+            return
 
-        embed = discord.Embed(
-            title=f"Ticket #{ticket_id} Transcript",
-            description="Ticket has been closed and archived",
-            color=discord.Color.red(),
-            timestamp=datetime.utcnow()
-        )
-        embed.add_field(name="Category", value=category_name)
-        embed.add_field(name="Created by", value=creator.name)
-        embed.add_field(name="Claimed by", value=claimed_by)
-        embed.add_field(name="Closed by", value=interaction.user.name)
-        embed.add_field(name="Transcript", value=transcript)
-
-        db.close_ticket(ticket_id)
-        await logs_channel.send(embed=embed, file=discord.File(fp=io.StringIO(transcript), filename=f"ticket-{ticket_id}-transcript.txt"))
-        await interaction.followup.send("Ticket will be closed in 15 seconds...")
-        await asyncio.sleep(15)
+        async with state.lock:
+            await interaction.response.defer()
+            await _archive_ticket(interaction.channel, ticket_id, interaction.user.name)
+            await interaction.followup.send(f"Ticket will be closed in {TICKET_CLOSE_DELAY} seconds...")
+            state.status = TICKET_STATE_CLOSED
+
+        await asyncio.sleep(TICKET_CLOSE_DELAY)
         await interaction.channel.delete()
 
     @app_commands.command(name="ticket", description="Create a support ticket")
@@ -724,6 +1284,69 @@ class Tickets(commands.Cog):
                 return
         await interaction.response.send_message("Panel message not found.", ephemeral=True)
 
+    @app_commands.command(name="ticket_export", description="Export tickets, transactions and feedback")
+    @app_commands.checks.has_permissions(administrator=True)
+    @app_commands.choices(
+        ticket_type=[app_commands.Choice(name=data["name"], value=ticket_type) for ticket_type, data in TICKET_CATEGORIES.items()],
+        file_format=[app_commands.Choice(name=f, value=f) for f in EXPORT_FORMATS]
+    )
+    async def ticket_export(self, interaction: discord.Interaction, ticket_type: str = None, since: str = None, until: str = None,
+                            claimer: discord.Member = None, transactions_only: bool = False, include_transcripts: bool = False,
+                            file_format: str = "jsonl"):
+        try:
+            since_date, until_date = parse_date(since), parse_date(until)
+        except ValueError:
+            return await interaction.response.send_message("Dates must be in YYYY-MM-DD format.", ephemeral=True)
+
+        # Parts are posted to an admin-only channel – the interaction token expires after 15 minutes
+        exports_channel = discord.utils.get(interaction.guild.text_channels, name="ticket-exports")
+        if not exports_channel:
+            overwrites = {
+                interaction.guild.default_role: discord.PermissionOverwrite(read_messages=False),
+                interaction.guild.me: discord.PermissionOverwrite(read_messages=True, send_messages=True, attach_files=True)
+            }
+            exports_channel = await interaction.guild.create_text_channel(name="ticket-exports", overwrites=overwrites, topic="Ticket data exports")
+        await interaction.response.send_message(f"Export started, files will be posted in {exports_channel.mention}.", ephemeral=True)
+
+        # Leave room for the multipart request around the file
+        upload_limit = interaction.guild.filesize_limit - EXPORT_UPLOAD_HEADROOM
+        parts = skipped = 0
+        try:
+            with tempfile.TemporaryDirectory() as directory:
+                export = export_tickets(
+                    db.tickets,
+                    directory,
+                    file_format=file_format,
+                    include_transcripts=include_transcripts,
+                    chunk_size=min(EXPORT_CHUNK_SIZE, upload_limit),
+                    ticket_type=ticket_type,
+                    since=since_date,
+                    until=until_date,
+                    claimer=claimer.id if claimer else None,
+                    transactions_only=transactions_only
+                )
+                # Each part is written off the event loop and uploaded before the next one is produced
+                while True:
+                    path = await asyncio.to_thread(next, export, None)
+                    if path is None:
+                        break
+                    if os.path.getsize(path) > upload_limit:
+                        # Only a single huge ticket (usually its transcript) can outgrow a part
+                        skipped += 1
+                        await exports_channel.send(f"Skipped {os.path.basename(path)}: one ticket in it is larger than the upload limit.")
+                    else:
+                        parts += 1
+                        await exports_channel.send(file=discord.File(path))
+                    os.remove(path)
+        except Exception as e:
+            logging.error(f"Error in ticket export: {e}")
+            return await exports_channel.send(f"Export requested by {interaction.user.mention} failed after {parts} file(s): {e}")
+
+        if parts or skipped:
+            await exports_channel.send(f"Export requested by {interaction.user.mention} finished in {parts} file(s), {skipped} skipped.")
+        else:
+            await exports_channel.send(f"Export requested by {interaction.user.mention}: no tickets matched the filters.")
+
     @app_commands.command(name="setprices", description="Set price for a rank and method")
     @app_commands.checks.has_permissions(administrator=True)
     async def setprices(self, interaction: discord.Interaction, rank: str, method: str, price: float):
@@ -734,18 +1357,21 @@ class Tickets(commands.Cog):
     @app_commands.checks.has_permissions(administrator=True)
     async def addrank(self, interaction: discord.Interaction, rank: str):
         db.add_rank(rank)
+        catalog.invalidate()
         await interaction.response.send_message(f"Rank {rank} added.", ephemeral=True)
 
     @app_commands.command(name="removerank", description="Remove a rank")
     @app_commands.checks.has_permissions(administrator=True)
     async def removerank(self, interaction: discord.Interaction, rank: str):
         db.remove_rank(rank)
+        catalog.invalidate()
         await interaction.response.send_message(f"Rank {rank} removed.", ephemeral=True)
 
     @app_commands.command(name="addmethod", description="Add a payment method")
     @app_commands.checks.has_permissions(administrator=True)
     async def addmethod(self, interaction: discord.Interaction, method_name: str):
         db.add_payment_method(method_name)
+        catalog.invalidate()
         await interaction.response.send_message(f"Payment method {method_name} added.", ephemeral=True)
 
     @app_commands.command(name="setpaymet", description="Set payment details for a method")
@@ -754,8 +1380,23 @@ class Tickets(commands.Cog):
         id_value = id_value if id_value else "not set yet"
         qr = qr if qr else "not set yet"
         db.set_payment(method, id_value, qr)
+        catalog.invalidate()
         await interaction.response.send_message(f"Payment details for {method} set. ID: {id_value}, QR: {qr}.", ephemeral=True)
 
 async def setup(bot):
-    await bot.add_cog(Tickets(bot))
+    # Installed once per bot – reloading the extension must not wrap the REST layer twice
+    if RECORD_PATH and not hasattr(bot, "ticket_recorder"):
+        from ticket_replay import Recorder
+        bot.ticket_recorder = Recorder(RECORD_PATH)
+        bot.ticket_recorder.install(bot)
+
+    started = time.perf_counter()
+    cog = Tickets(bot)
+    await bot.add_cog(cog)
+    startup_profile.record("cog_load", started)
+    # Reloaded after the gateway is ready – on_ready will not fire again
+    if bot.is_ready():
+        cog._warmup = asyncio.create_task(cog.on_ready())
     print("Tickets cog loaded")
+
+startup_profile.record("import", _IMPORT_STARTED)
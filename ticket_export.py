@@ -0,0 +1,186 @@
+import argparse
+import csv
+import gzip
+import io
+import json
+import os
+from datetime import datetime, timezone
+
+# Transcripts are saved here on close so exports can include them
+TRANSCRIPT_DIR = "transcripts"
+EXPORT_FORMATS = ("jsonl", "csv")
+EXPORT_CHUNK_SIZE = 8 * 1024 * 1024  # max compressed bytes per part – the bot passes its guild's upload limit
+# CSV columns – known ticket record fields; JSONL rows keep every field
+EXPORT_COLUMNS = (
+    "ticket_id", "channel_id", "user_id", "type", "title", "description", "category_name", "priority",
+    "assigned_to", "created_at", "closed_at", "status", "transaction_info", "feedback", "transcript"
+)
+
+# ───────────── Transcript Storage ─────────────
+
+def _transcript_path(ticket_id: int) -> str:
+    return os.path.join(TRANSCRIPT_DIR, f"ticket-{ticket_id}.txt.gz")
+
+def save_transcript(ticket_id: int, transcript: str):
+    os.makedirs(TRANSCRIPT_DIR, exist_ok=True)
+    with gzip.open(_transcript_path(ticket_id), "wt", encoding="utf-8") as f:
+        f.write(transcript)
+
+def load_transcript(ticket_id: int):
+    try:
+        with gzip.open(_transcript_path(ticket_id), "rt", encoding="utf-8") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+# ───────────── Export Pipeline ─────────────
+
+def _as_datetime(value):
+    """Normalize a stored date to an aware UTC datetime; naive values are taken as UTC."""
+    if isinstance(value, (int, float)):
+        return datetime.fromtimestamp(value, tz=timezone.utc)
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    if not isinstance(value, datetime):
+        return None
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+def iter_tickets(tickets):
+    """Yield one flat row per ticket record without copying the records themselves."""
+    # Snapshot only the keys – the bot may add or close tickets while an export runs
+    for ticket_id in list(tickets):
+        record = tickets.get(ticket_id)
+        if record is None:
+            continue
+        row = {"ticket_id": ticket_id}
+        row.update(record)
+        yield row
+
+def filter_tickets(rows, ticket_type: str = None, since: datetime = None, until: datetime = None, claimer: int = None, transactions_only: bool = False):
+    for row in rows:
+        if ticket_type and row.get("type") != ticket_type:
+            continue
+        if claimer is not None and str(row.get("assigned_to")) != str(claimer):
+            continue
+        if transactions_only and not row.get("transaction_info"):
+            continue
+        if since or until:
+            created_at = _as_datetime(row.get("created_at"))
+            if created_at is None:
+                continue
+            if since and created_at < since:
+                continue
+            if until and created_at >= until:
+                continue
+        yield row
+
+def attach_transcripts(rows):
+    for row in rows:
+        row["transcript"] = load_transcript(row["ticket_id"])
+        yield row
+
+def _encode_row(row, file_format: str) -> bytes:
+    if file_format == "csv":
+        buffer = io.StringIO(newline="")
+        csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS, restval="", extrasaction="ignore").writerow(row)
+        return buffer.getvalue().encode("utf-8")
+    return (json.dumps(row, default=str) + "\n").encode("utf-8")
+
+def _max_compressed(size: int) -> int:
+    # Deflate's worst case for incompressible input, plus the gzip trailer and final block
+    return size + size // 1000 + 64
+
+def write_export(rows, directory: str, file_format: str = "jsonl", chunk_size: int = EXPORT_CHUNK_SIZE, prefix: str = "tickets"):
+    """Stream rows into gzip parts of at most `chunk_size` bytes, yielding each finished part's path.
+
+    A part is closed before a row that might not fit, so only a single row larger than `chunk_size`
+    can produce a bigger part.
+    """
+    if file_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {file_format}")
+    header = b""
+    if file_format == "csv":
+        buffer = io.StringIO(newline="")
+        csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS).writeheader()
+        header = buffer.getvalue().encode("utf-8")
+
+    part = 0
+    raw = compressed = None
+    pending = 0  # uncompressed bytes the compressor has not flushed to the file yet
+    for row in rows:
+        line = _encode_row(row, file_format)
+        if raw is not None and raw.tell() + _max_compressed(pending + len(line)) > chunk_size:
+            # Flush to learn the real size – only done near the limit, so compression barely suffers
+            compressed.flush()
+            pending = 0
+            if raw.tell() + _max_compressed(len(line)) > chunk_size:
+                compressed.close()
+                raw.close()
+                raw = None
+                yield path
+
+        if raw is None:
+            part += 1
+            path = os.path.join(directory, f"{prefix}-{part:03d}.{file_format}.gz")
+            raw = open(path, "wb")
+            compressed = gzip.GzipFile(fileobj=raw, mode="wb")
+            compressed.write(header)
+            pending = len(header)
+
+        compressed.write(line)
+        pending += len(line)
+
+    if raw is not None:
+        compressed.close()
+        raw.close()
+        yield path
+
+def export_tickets(tickets, directory: str, file_format: str = "jsonl", include_transcripts: bool = False, chunk_size: int = EXPORT_CHUNK_SIZE, **filters):
+    rows = filter_tickets(iter_tickets(tickets), **filters)
+    if include_transcripts:
+        rows = attach_transcripts(rows)
+    prefix = "transactions" if filters.get("transactions_only") else "tickets"
+    return write_export(rows, directory, file_format, chunk_size, prefix)
+
+def parse_date(value: str):
+    return datetime.strptime(value, "%Y-%m-%d").replace(tzinfo=timezone.utc) if value else None
+
+# ───────────── Command Line ─────────────
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export tickets, transactions and feedback to compressed JSONL or CSV")
+    parser.add_argument("--type", dest="ticket_type", help="Only export this ticket type (e.g. rank, appeal, report)")
+    parser.add_argument("--since", type=parse_date, help="Only tickets created on or after this date (YYYY-MM-DD)")
+    parser.add_argument("--until", type=parse_date, help="Only tickets created before this date (YYYY-MM-DD)")
+    parser.add_argument("--claimer", type=int, help="Only tickets claimed by this user ID")
+    parser.add_argument("--transactions", dest="transactions_only", action="store_true", help="Only tickets with transaction info")
+    parser.add_argument("--transcripts", dest="include_transcripts", action="store_true", help="Include saved transcripts")
+    parser.add_argument("--format", dest="file_format", choices=EXPORT_FORMATS, default="jsonl")
+    parser.add_argument("--chunk-size", type=int, default=EXPORT_CHUNK_SIZE, help="Compressed bytes per output file")
+    parser.add_argument("--output", default=".", help="Directory to write export parts to")
+    args = parser.parse_args(argv)
+
+    from utils.db import db
+
+    os.makedirs(args.output, exist_ok=True)
+    for path in export_tickets(
+        db.tickets,
+        args.output,
+        file_format=args.file_format,
+        include_transcripts=args.include_transcripts,
+        chunk_size=args.chunk_size,
+        ticket_type=args.ticket_type,
+        since=args.since,
+        until=args.until,
+        claimer=args.claimer,
+        transactions_only=args.transactions_only
+    ):
+        print(path)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,408 @@
+import argparse
+import asyncio
+import atexit
+import json
+import logging
+import os
+import queue
+import re
+import struct
+import tempfile
+import threading
+import time
+import zlib
+from collections import Counter, defaultdict, deque
+
+import discord
+from discord.ext import commands
+from discord.webhook.async_ import AsyncWebhookAdapter
+
+import ticket_export
+
+# Log record: timestamp, kind, payload length, then the zlib-compressed JSON payload
+RECORD_HEADER = struct.Struct("<dBI")
+KIND_GATEWAY = 0  # {"t": event name, "d": event data}
+KIND_REST = 1     # {"m": method, "p": route path, "d": response data} or {"m", "p", "e": status, "c": code, "x": text}
+
+# Gateway events the replayer needs to rebuild the cache and drive the cog; everything else is not recorded
+RECORDED_EVENTS = {
+    "READY", "GUILD_CREATE", "GUILD_DELETE", "GUILD_ROLE_CREATE", "GUILD_ROLE_UPDATE", "GUILD_ROLE_DELETE",
+    "CHANNEL_CREATE", "CHANNEL_UPDATE", "CHANNEL_DELETE", "MESSAGE_CREATE", "INTERACTION_CREATE"
+}
+
+INTERACTION_CALLBACK = re.compile(r"/interactions/(\d+)/[^/]+/callback")
+
+def read_log(path: str):
+    """Yield (timestamp, kind, payload) records; a truncated final record is ignored."""
+    with open(path, "rb") as f:
+        while True:
+            header = f.read(RECORD_HEADER.size)
+            if len(header) < RECORD_HEADER.size:
+                return
+            timestamp, kind, size = RECORD_HEADER.unpack(header)
+            blob = f.read(size)
+            if len(blob) < size:
+                return
+            yield timestamp, kind, json.loads(zlib.decompress(blob))
+
+def _route_key(route) -> str:
+    return f"{route.method} {route.path}"
+
+# ───────────── Recording ─────────────
+
+def _mask(value):
+    # Keep the shape (length, digits, separators) so replayed validation takes the same path
+    if not isinstance(value, str):
+        return value
+    return re.sub(r"\d", "1", re.sub(r"[^\W\d_]", "x", value))
+
+def _redact_message(data):
+    if isinstance(data, list):
+        return [_redact_message(item) for item in data]
+    if not isinstance(data, dict) or not ("content" in data or "embeds" in data):
+        return data
+    data = dict(data, content=_mask(data.get("content")))
+    embeds = []
+    for embed in data.get("embeds") or []:
+        embed = dict(embed, description=_mask(embed.get("description")))
+        embed["fields"] = [dict(field, value=_mask(field.get("value"))) for field in embed.get("fields") or []]
+        embeds.append(embed)
+    data["embeds"] = embeds
+    return data
+
+def _redact_interaction(data):
+    data = dict(data, token="redacted")
+    if data.get("type") == 5:  # modal submit – payment details, UTR numbers, appeals
+        rows = []
+        for row in data["data"].get("components", []):
+            components = [dict(component, value=_mask(component.get("value"))) for component in row.get("components", [])]
+            rows.append(dict(row, components=components))
+        data["data"] = dict(data["data"], components=rows)
+    return data
+
+def _redact_event(name: str, data):
+    if name == "INTERACTION_CREATE":
+        return _redact_interaction(data)
+    if name == "MESSAGE_CREATE":
+        return _redact_message(data)
+    if name == "GUILD_CREATE":
+        return {key: value for key, value in data.items() if key != "presences"}
+    return data
+
+# Opt-in recorder – enabled by setting TICKET_RECORD_PATH before the Tickets cog is loaded
+class Recorder:
+    """Record gateway events and REST responses; encoding and disk writes happen on a background thread."""
+
+    def __init__(self, path: str):
+        self._file = open(path, "ab")
+        self._queue = queue.SimpleQueue()
+        self._restore = []
+        self._closed = False
+        self._stopped = False  # set on close or when the writer fails; write() then drops records
+        self._thread = threading.Thread(target=self._drain, name="ticket-recorder", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def write(self, kind: int, payload: dict):
+        if self._stopped:
+            return
+        self._queue.put((time.time(), kind, payload))
+
+    def _drain(self):
+        try:
+            while True:
+                batch = [self._queue.get()]
+                while not self._queue.empty():
+                    batch.append(self._queue.get())
+                for item in batch:
+                    if item is None:
+                        return
+                    timestamp, kind, payload = item
+                    blob = zlib.compress(json.dumps(payload, separators=(",", ":"), default=str).encode())
+                    self._file.write(RECORD_HEADER.pack(timestamp, kind, len(blob)) + blob)
+                self._file.flush()
+        except Exception as e:
+            # Stop recording instead of letting the queue grow without a writer
+            self._stopped = True
+            logging.error(f"Ticket recorder stopped: {e}")
+            while self._queue.get() is not None:
+                pass  # drop records queued before write() saw the flag, until close()
+        finally:
+            try:
+                self._file.close()
+            except OSError:
+                pass
+
+    def close(self, wait: bool = True):
+        """Undo the patches and stop recording; with `wait`, block until the queued records are written."""
+        if not self._closed:
+            self._closed = True
+            self._stopped = True
+            for restore in reversed(self._restore):
+                restore()
+            self._restore.clear()
+            self._queue.put(None)
+        if wait:
+            self._thread.join()
+
+    def install(self, bot):
+        # The websocket dispatches through this same dict, so wrapping entries captures the gateway events
+        parsers = bot._connection.parsers
+        for name in RECORDED_EVENTS & parsers.keys():
+            original_parser = parsers[name]
+            parsers[name] = self._wrap_parser(name, original_parser)
+            self._restore.append(lambda name=name, parser=original_parser: parsers.__setitem__(name, parser))
+
+        original_request = bot.http.request
+        bot.http.request = self._wrap_request(original_request)
+        self._restore.append(lambda: setattr(bot.http, "request", original_request))
+
+        # Interaction responses and followups go through the webhook adapter, not bot.http
+        original_adapter_request = AsyncWebhookAdapter.request
+        AsyncWebhookAdapter.request = self._wrap_adapter_request(original_adapter_request)
+        self._restore.append(lambda: setattr(AsyncWebhookAdapter, "request", original_adapter_request))
+
+    def _wrap_parser(self, name: str, parser):
+        def parse(data):
+            self.write(KIND_GATEWAY, {"t": name, "d": _redact_event(name, data)})
+            return parser(data)
+        return parse
+
+    async def _record(self, route, pending):
+        try:
+            data = await pending
+        except discord.HTTPException as e:
+            self.write(KIND_REST, {"m": route.method, "p": route.path, "e": e.status, "c": e.code, "x": e.text})
+            raise
+        self.write(KIND_REST, {"m": route.method, "p": route.path, "d": _redact_message(data)})
+        return data
+
+    def _wrap_request(self, original):
+        async def request(route, *args, **kwargs):
+            return await self._record(route, original(route, *args, **kwargs))
+        return request
+
+    def _wrap_adapter_request(self, original):
+        async def request(adapter, route, *args, **kwargs):
+            return await self._record(route, original(adapter, route, *args, **kwargs))
+        return request
+
+# ───────────── Replay ─────────────
+
+class _ReplayedResponse:
+    def __init__(self, status: int):
+        self.status = status
+        self.reason = "Replayed"
+
+def _replayed_error(payload: dict) -> discord.HTTPException:
+    """Rebuild the discord.py exception for a recorded error response."""
+    status = payload["e"]
+    if status == 403:
+        error = discord.Forbidden
+    elif status == 404:
+        error = discord.NotFound
+    elif status >= 500:
+        error = discord.DiscordServerError
+    else:
+        error = discord.HTTPException
+    return error(_ReplayedResponse(status), {"code": payload.get("c", 0), "message": payload.get("x", "")})
+
+# Fake REST layer – answers each route with the responses recorded for it, in order
+class FakeHTTP:
+    def __init__(self):
+        self.responses = defaultdict(deque)
+        self.calls = Counter()
+        self.unmatched = Counter()
+        self.responded = {}  # interaction id -> time of its first response
+
+    def feed(self, payload: dict):
+        self.responses[f"{payload['m']} {payload['p']}"].append(payload)
+
+    async def request(self, route, *args, **kwargs):
+        key = _route_key(route)
+        self.calls[key] += 1
+        match = INTERACTION_CALLBACK.search(route.url)
+        if match:
+            self.responded.setdefault(int(match.group(1)), time.perf_counter())
+
+        queue = self.responses.get(key)
+        if not queue:
+            self.unmatched[key] += 1
+            return None
+        payload = queue.popleft()
+        if "e" in payload:
+            raise _replayed_error(payload)
+        return payload["d"]
+
+class ReplayReport:
+    def __init__(self):
+        self.events = 0
+        self.duration = 0.0
+        self.latencies = []
+        self.calls = Counter()
+        self.unmatched = Counter()
+
+    @staticmethod
+    def _percentile(values, fraction):
+        if not values:
+            return None
+        ordered = sorted(values)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    def summary(self) -> dict:
+        def ms(value):
+            return None if value is None else round(value * 1000, 3)
+        return {
+            "events": self.events,
+            "duration_ms": ms(self.duration),
+            "interactions": len(self.latencies),
+            "latency_ms": {
+                "p50": ms(self._percentile(self.latencies, 0.5)),
+                "p95": ms(self._percentile(self.latencies, 0.95)),
+                "max": ms(max(self.latencies) if self.latencies else None)
+            },
+            "api_calls": dict(sorted(self.calls.items())),
+            "unmatched_calls": dict(sorted(self.unmatched.items()))
+        }
+
+class Replayer:
+    """Drive the Tickets cog with a recorded log against a fake Discord layer.
+
+    Run it with a scratch config.py/utils.db – the cog's db writes are not faked. The command hash,
+    inactivity state and transcripts go to a temporary directory.
+    """
+
+    def __init__(self, path: str, speed: float = 1.0, extension: str = "ticket"):
+        self.path = path
+        self.speed = speed  # 0 replays as fast as possible
+        self.extension = extension
+
+    async def run(self) -> ReplayReport:
+        os.environ.pop("TICKET_RECORD_PATH", None)
+        http = FakeHTTP()
+        report = ReplayReport()
+        dispatched = {}
+
+        intents = discord.Intents.default()
+        intents.members = True
+        intents.message_content = True
+        bot = commands.Bot(command_prefix="!", intents=intents, chunk_guilds_at_startup=False)
+        original_adapter_request = AsyncWebhookAdapter.request
+        transcript_dir = ticket_export.TRANSCRIPT_DIR
+
+        async def adapter_request(adapter, route, *args, **kwargs):
+            return await http.request(route)
+
+        with tempfile.TemporaryDirectory() as directory:
+            async with bot:
+                bot.http.request = http.request
+                AsyncWebhookAdapter.request = adapter_request
+                try:
+                    await bot.load_extension(self.extension)
+                    module = bot.extensions[self.extension]
+                    # Keep the replay's files away from the deployment's hash, tracker state and transcripts
+                    module.COMMAND_HASH_PATH = os.path.join(directory, "command_tree.hash")
+                    module.INACTIVITY_STATE_PATH = os.path.join(directory, "inactivity.json")
+                    ticket_export.TRANSCRIPT_DIR = os.path.join(directory, "transcripts")
+                    # The recording was made against an already synced tree; replaying must not add a sync call
+                    with open(module.COMMAND_HASH_PATH, "w") as f:
+                        f.write(module.command_tree_hash(bot.tree))
+                    if not self.speed:
+                        module.TICKET_CLOSE_DELAY = 0
+
+                    # Preload responses so handler timing cannot change which response a call receives
+                    for _, kind, payload in read_log(self.path):
+                        if kind == KIND_REST:
+                            http.feed(payload)
+
+                    parsers = bot._connection.parsers
+                    started = time.perf_counter()
+                    first_timestamp = None
+                    for timestamp, kind, payload in read_log(self.path):
+                        if kind != KIND_GATEWAY:
+                            continue
+                        if first_timestamp is None:
+                            first_timestamp = timestamp
+                        if self.speed:
+                            delay = (timestamp - first_timestamp) / self.speed - (time.perf_counter() - started)
+                            await asyncio.sleep(max(delay, 0))
+                        else:
+                            await asyncio.sleep(0)
+
+                        parser = parsers.get(payload["t"])
+                        if parser is None:
+                            continue
+                        if payload["t"] == "INTERACTION_CREATE":
+                            dispatched[int(payload["d"]["id"])] = time.perf_counter()
+                        report.events += 1
+                        parser(payload["d"])
+
+                    # Finish in-flight handlers while the cog is still loaded, before its state is saved
+                    cog = bot.get_cog("Tickets")
+                    await self._settle(ignore=(getattr(cog, "_sweeper", None),))
+                    report.duration = time.perf_counter() - started
+                    await bot.unload_extension(self.extension)
+                finally:
+                    AsyncWebhookAdapter.request = original_adapter_request
+                    ticket_export.TRANSCRIPT_DIR = transcript_dir
+
+        report.latencies = [http.responded[i] - t for i, t in dispatched.items() if i in http.responded]
+        report.calls = http.calls
+        report.unmatched = http.unmatched
+        return report
+
+    @staticmethod
+    async def _settle(ignore=(), timeout: float = 30):
+        # Let interaction handlers spawned by the replayed events finish; `ignore` holds long-running tasks
+        current = asyncio.current_task()
+        pending = [task for task in asyncio.all_tasks() if task is not current and task not in ignore and not task.done()]
+        if pending:
+            await asyncio.wait(pending, timeout=timeout)
+
+def diff_reports(base: dict, new: dict) -> list:
+    lines = []
+    for key in ("p50", "p95", "max"):
+        before, after = base["latency_ms"][key], new["latency_ms"][key]
+        if before is not None and after is not None:
+            lines.append(f"latency {key}: {before:.3f}ms -> {after:.3f}ms ({after - before:+.3f}ms)")
+    routes = sorted(set(base["api_calls"]) | set(new["api_calls"]))
+    for route in routes:
+        before, after = base["api_calls"].get(route, 0), new["api_calls"].get(route, 0)
+        if before != after:
+            lines.append(f"{route}: {before} -> {after} calls ({after - before:+d})")
+    before, after = sum(base["api_calls"].values()), sum(new["api_calls"].values())
+    lines.append(f"total API calls: {before} -> {after} ({after - before:+d})")
+    return lines
+
+# ───────────── Command Line ─────────────
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay recorded ticket traffic and compare runs")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    replay = subparsers.add_parser("replay", help="Replay a log recorded with TICKET_RECORD_PATH")
+    replay.add_argument("log")
+    replay.add_argument("--speed", type=float, default=1.0, help="Playback speed multiplier (default: recorded speed)")
+    replay.add_argument("--fast", action="store_true", help="Replay as fast as possible")
+    replay.add_argument("--report", help="Write the JSON report to this file")
+    diff = subparsers.add_parser("diff", help="Compare two replay reports")
+    diff.add_argument("base")
+    diff.add_argument("new")
+    args = parser.parse_args(argv)
+
+    if args.command == "diff":
+        with open(args.base) as f:
+            base = json.load(f)
+        with open(args.new) as f:
+            new = json.load(f)
+        print("\n".join(diff_reports(base, new)))
+        return
+
+    report = asyncio.run(Replayer(args.log, speed=0 if args.fast else args.speed).run())
+    summary = report.summary()
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(summary, f, indent=2)
+    print(json.dumps(summary, indent=2))
+
+if __name__ == "__main__":
+    main()